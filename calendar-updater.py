@@ -10,6 +10,9 @@ Parâmetros via variáveis de ambiente:
   - MONTHS_AHEAD: meses a partir de hoje (default: 12)
   - START_DATE: data inicial fixa no formato YYYY-MM-DD (opcional)
   - END_DATE: data final fixa no formato YYYY-MM-DD (opcional)
+  - SKIP_IF_UNCHANGED: se "true", envia If-Modified-Since com o mtime do OUTPUT_YAML
+    e não regera o arquivo quando o servidor responde 304 (default: false).
+    Só faz sentido quando o intervalo de datas não mudou desde a última geração.
 
 Exemplo de uso:
   $ export ICS_URL="https://www.officeholidays.com/ics-clean/brazil/sao-paulo"
@@ -17,15 +20,28 @@ Exemplo de uso:
   $ python3 gerar_feriados.py
 """
 
+import io
 import os
-from urllib.request import urlopen
+from email.utils import formatdate
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
 from datetime import datetime, date, timedelta
-from typing import List, Dict
+from itertools import chain
+from operator import itemgetter
+from typing import Iterable, Iterator, List, Tuple
+
+# Tamanho do buffer de leitura do ICS (leitura em streaming)
+READ_BUFFER_SIZE = 65536
+HTTP_TIMEOUT = 30  # segundos
+
+# Caracteres que obrigam o nome do feriado a ser escrito entre aspas no YAML
+_YAML_SPECIALS = frozenset(":-#{}[],&*!|>'\"%@`")
 
 # === Lê variáveis de ambiente ===
 ICS_URL = os.getenv("ICS_URL", "https://www.officeholidays.com/ics-clean/brazil/sao-paulo")
 OUTPUT_YAML = os.getenv("OUTPUT_YAML", "feriados.yaml")
 MONTHS_AHEAD = int(os.getenv("MONTHS_AHEAD", "12"))
+SKIP_IF_UNCHANGED = os.getenv("SKIP_IF_UNCHANGED", "").strip().lower() in {"1", "true", "on", "yes", "y"}
 
 # Datas opcionais fixas
 START_DATE_ENV = os.getenv("START_DATE")
@@ -40,86 +56,108 @@ else:
     START_DATE = today
     END_DATE = today + timedelta(days=30 * MONTHS_AHEAD)
 
-def _unfold_ical_lines(raw_text: str) -> List[str]:
-    lines = raw_text.splitlines()
-    unfolded = []
-    for ln in lines:
-        if ln.startswith(" "):  # continuação da linha anterior
-            if unfolded:
-                unfolded[-1] += ln[1:]
-        else:
-            unfolded.append(ln)
-    return unfolded
-
 def _parse_ical_datetime(value: str) -> date:
-    fmts = ["%Y%m%d", "%Y%m%dT%H%M%SZ", "%Y%m%dT%H%M%S"]
-    for fmt in fmts:
-        try:
-            return datetime.strptime(value.strip(), fmt).date()
-        except ValueError:
-            continue
+    # Formatos aceitos: YYYYMMDD, YYYYMMDDTHHMMSS e YYYYMMDDTHHMMSSZ; o prefixo
+    # da data é o mesmo nos três, então basta validar o formato pelo tamanho
+    v = value.strip()
+    n = len(v)
+    if n == 8:
+        ok = v.isdigit()
+    elif n in (15, 16):
+        ok = v[:8].isdigit() and v[8] == "T" and v[9:15].isdigit() and (n == 15 or v[15] == "Z")
+    else:
+        ok = False
+    if ok:
+        return date(int(v[0:4]), int(v[4:6]), int(v[6:8]))
     raise ValueError(f"Formato de data não suportado: {value}")
 
-def _extract_events(ics_text: str) -> List[Dict[str, str]]:
-    lines = _unfold_ical_lines(ics_text)
-    events = []
+# Propriedades do VEVENT que interessam → conversor do valor (erro = ignora)
+_PROPERTY_PARSERS = {
+    "SUMMARY": str,
+    "DTSTART": _parse_ical_datetime,
+}
+
+def _iter_events(lines: Iterable[str]) -> Iterator[Tuple[date, str]]:
+    """
+    Percorre o ICS em uma única passada (unfold → VEVENT → filtro), gerando
+    (data, summary) apenas dos eventos que vão para o YAML.
+    """
     in_event = False
-    curr = {}
+    curr = {}  # reaproveitado entre eventos
+    pendente = None
+
+    # a linha só é processada quando a seguinte não é continuação (linhas
+    # iniciadas por espaço); a linha vazia final descarrega a pendente
+    for ln in chain(lines, ("",)):
+        ln = ln.rstrip("\r\n")
+        if ln.startswith(" "):  # continuação da linha anterior
+            if pendente is not None:
+                pendente += ln[1:]
+            continue
+        ln, pendente = pendente, ln
+        if ln is None:
+            continue
 
-    for ln in lines:
         if ln == "BEGIN:VEVENT":
             in_event = True
-            curr = {}
+            curr.clear()
         elif ln == "END:VEVENT":
-            if in_event and "summary" in curr and "date" in curr:
-                events.append(curr)
+            summary = curr.get("SUMMARY")
+            d = curr.get("DTSTART")
+            if (
+                in_event
+                and summary
+                and d is not None
+                and not summary.endswith("(Government Holiday)")
+                and START_DATE <= d < END_DATE
+            ):
+                yield d, summary
             in_event = False
-            curr = {}
         elif in_event:
-            if ln.startswith("SUMMARY"):
-                value = ln.split(":", 1)[1].strip() if ":" in ln else ""
-                curr["summary"] = value
-            elif ln.startswith("DTSTART"):
-                value = ln.split(":", 1)[1].strip() if ":" in ln else ""
+            head, sep, value = ln.partition(":")
+            if not sep:
+                continue
+            key = head.split(";", 1)[0]
+            parser = _PROPERTY_PARSERS.get(key)
+            if parser is not None:
                 try:
-                    curr["date"] = _parse_ical_datetime(value)
+                    curr[key] = parser(value.strip())
                 except ValueError:
                     pass
-    return events
-
-def _filter_events(events: List[Dict[str, str]]) -> List[Dict[str, str]]:
-    filtered = []
-    for e in events:
-        summary = e.get("summary", "").strip()
-        d = e.get("date")
-        if not summary or not d:
-            continue
-        if summary.endswith("(Government Holiday)"):
-            continue
-        if START_DATE <= d < END_DATE:
-            filtered.append({"summary": summary, "date": d})
-    filtered.sort(key=lambda x: x["date"])
-    return filtered
 
-def _write_yaml(events: List[Dict[str, str]], filepath: str) -> None:
+def _write_yaml(events: List[Tuple[date, str]], filepath: str) -> None:
+    parts = ["feriados:\n"]
+    for d, name in events:
+        parts.append(f"  - data: {d.isoformat()}\n")
+        if not _YAML_SPECIALS.isdisjoint(name):
+            name = name.replace("\"", "\\\"")
+            parts.append(f"    nome: \"{name}\"\n")
+        else:
+            parts.append(f"    nome: {name}\n")
     with open(filepath, "w", encoding="utf-8") as f:
-        f.write("feriados:\n")
-        for e in events:
-            f.write(f"  - data: {e['date'].isoformat()}\n")
-            name = e["summary"]
-            if any(c in name for c in [":", "-", "#", "{", "}", "[", "]", ",", "&", "*", "!", "|", ">", "'", "\"", "%", "@", "`"]):
-                name = name.replace("\"", "\\\"")
-                f.write(f"    nome: \"{name}\"\n")
-            else:
-                f.write(f"    nome: {name}\n")
+        f.write("".join(parts))
 
 def main():
     print(f"Baixando ICS de {ICS_URL} ...")
-    with urlopen(ICS_URL) as resp:
-        ics_text = resp.read().decode("utf-8", errors="replace")
+    req = Request(ICS_URL)
+    if SKIP_IF_UNCHANGED and os.path.exists(OUTPUT_YAML):
+        req.add_header("If-Modified-Since", formatdate(os.path.getmtime(OUTPUT_YAML), usegmt=True))
+    try:
+        resp = urlopen(req, timeout=HTTP_TIMEOUT)
+    except HTTPError as e:
+        if e.code == 304:
+            print(f"ICS não mudou desde a última geração de '{OUTPUT_YAML}'. Nada a fazer.")
+            return
+        raise
+
+    with resp:
+        linhas = io.TextIOWrapper(
+            io.BufferedReader(resp, buffer_size=READ_BUFFER_SIZE),
+            encoding="utf-8",
+            errors="replace",
+        )
+        events = sorted(_iter_events(linhas), key=itemgetter(0))
 
-    events = _extract_events(ics_text)
-    events = _filter_events(events)
     _write_yaml(events, OUTPUT_YAML)
 
     print(f"✅ Gerado '{OUTPUT_YAML}' com {len(events)} feriado(s) entre {START_DATE} e {END_DATE - timedelta(days=1)}.")
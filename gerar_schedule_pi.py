@@ -13,34 +13,54 @@ Continua respeitando:
 """
 
 import os
+import pickle
+import struct
 import sys
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import date, datetime, timedelta
-from typing import List, Dict, Any, Optional, Set
-
-import yaml
-
-try:
-    from zoneinfo import ZoneInfo
-    _ZONEINFO_AVAILABLE = True
-except Exception:
-    _ZONEINFO_AVAILABLE = False
+from functools import lru_cache
+from itertools import compress, islice
+from typing import AbstractSet, Any, Dict, FrozenSet, List, Optional, Set, Tuple
 
 # --------- CONFIG (pode sobrescrever por env vars) ----------
-ARQ_FERIADOS = Path(os.environ.get("FERIADOS_FILE", "feriados.yaml"))
-ARQ_PI       = Path(os.environ.get("PLANING_INTERVAL_FILE", "planing-interval.yaml"))
-ARQ_SCHEDULE = Path(os.environ.get("PLANING_INTERVAL_SCHEDULE_FILE", "planing-interval-schedule.yaml"))
-
-ARQ_SKIP     = Path("skip-dates.txt")
-ENV_START    = "PLANNING_INTERVAL_START_DATE"  # ainda suportado se não existir schedule
-ENV_SKIP_EMENDAS = os.environ.get("SKIP_EMENDAS", "").strip().lower() in {"1", "true", "on", "yes", "y"}
+ENV_START = "PLANNING_INTERVAL_START_DATE"  # ainda suportado se não existir schedule
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    feriados: Path
+    pi: Path
+    schedule: Path
+    skip: Path
+    start_env: Optional[str]
+    skip_emendas: bool
+
+    @classmethod
+    def load(cls) -> "Config":
+        """Lê as variáveis de ambiente uma única vez."""
+        env = os.environ
+        return cls(
+            feriados=Path(env.get("FERIADOS_FILE", "feriados.yaml")),
+            pi=Path(env.get("PLANING_INTERVAL_FILE", "planing-interval.yaml")),
+            schedule=Path(env.get("PLANING_INTERVAL_SCHEDULE_FILE", "planing-interval-schedule.yaml")),
+            skip=Path("skip-dates.txt"),
+            start_env=env.get(ENV_START),
+            skip_emendas=env.get("SKIP_EMENDAS", "").strip().lower() in {"1", "true", "on", "yes", "y"},
+        )
 # ------------------------------------------------------------
 
 # ----------------- Utilidades de data -----------------------
+# as mesmas strings ISO do schedule são convertidas várias vezes por execução
+_parse_iso = lru_cache(maxsize=4096)(date.fromisoformat)
+
+@lru_cache(maxsize=1)
 def hoje_sao_paulo() -> date:
-    if _ZONEINFO_AVAILABLE:
-        return datetime.now(ZoneInfo("America/Sao_Paulo")).date()
-    return date.today()
+    # constante durante a execução do script; zoneinfo só é importado aqui
+    try:
+        from zoneinfo import ZoneInfo
+    except Exception:
+        return date.today()
+    return datetime.now(ZoneInfo("America/Sao_Paulo")).date()
 
 def parse_data(val) -> date:
     if isinstance(val, date) and not isinstance(val, datetime):
@@ -48,58 +68,226 @@ def parse_data(val) -> date:
     if isinstance(val, datetime):
         return val.date()
     if isinstance(val, str):
-        return date.fromisoformat(val.strip())
+        return _parse_iso(val.strip())
     raise ValueError(f"Formato de data não suportado: {val!r}")
 
-def eh_dia_util(d: date, feriados: Set[date]) -> bool:
-    return d.weekday() < 5 and d not in feriados
+# O calendário trabalha com ordinais (date.toordinal()): somar 1 e testar um
+# índice no mapa evita criar date/timedelta a cada passo.
+# O ordinal 1 (0001-01-01) é uma segunda, logo weekday == (o + 6) % 7.
+_SEMANA_UTIL = b"\x01\x01\x01\x01\x01\x00\x00"  # seg..dom
+
+def _mapa_dias_uteis_ord(inicio_ord: int, dias: int, feriados_ord: AbstractSet[int]) -> bytearray:
+    """mapa[i] == 1 se o ordinal (inicio_ord + i) é dia útil."""
+    # fins de semana: repete o padrão semanal (em C); depois zera só os feriados
+    wd = (inicio_ord + 6) % 7
+    semana = _SEMANA_UTIL[wd:] + _SEMANA_UTIL[:wd]
+    mapa = bytearray(semana * (dias // 7 + 1))
+    del mapa[dias:]
+    fim_ord = inicio_ord + dias
+    for o in feriados_ord:
+        if inicio_ord <= o < fim_ord:
+            mapa[o - inicio_ord] = 0
+    return mapa
+
+class CalendarioDiasUteis:
+    """
+    Dias úteis pré-calculados em um bitmap (1 = dia útil) indexado por
+    date.toordinal() - base. Montado uma vez em main e compartilhado;
+    o mapa é estendido se uma consulta cair fora do horizonte.
+    """
 
-def proximo_dia_util(d: date, feriados: Set[date]) -> date:
-    atual = d
-    while not eh_dia_util(atual, feriados):
-        atual += timedelta(days=1)
-    return atual
+    def __init__(self, feriados: FrozenSet[date], base: date, horizonte: int = 800):
+        self.feriados_ord = frozenset(d.toordinal() for d in feriados)
+        self.horizonte = horizonte
+        self.base = base.toordinal()
+        self.mapa = _mapa_dias_uteis_ord(self.base, horizonte, self.feriados_ord)
+
+    def _estender(self) -> None:
+        inicio = self.base + len(self.mapa)
+        self.mapa += _mapa_dias_uteis_ord(inicio, self.horizonte, self.feriados_ord)
+
+    def _indice(self, o: int) -> int:
+        i = o - self.base
+        if i < 0:  # antes da base: estende o mapa para trás
+            n = max(-i, self.horizonte)
+            self.base -= n
+            self.mapa[:0] = _mapa_dias_uteis_ord(self.base, n, self.feriados_ord)
+            i += n
+        while i >= len(self.mapa):
+            self._estender()
+        return i
+
+    def proximo_ord(self, o: int) -> int:
+        """Ordinal do primeiro dia útil >= o."""
+        i = self.mapa.find(1, self._indice(o))
+        while i < 0:
+            fim = len(self.mapa)
+            self._estender()
+            i = self.mapa.find(1, fim)
+        return self.base + i
+
+    def dias_uteis_ord(self, o: int, n: int) -> List[int]:
+        """Ordinais dos n primeiros dias úteis >= o (compress/islice sobre o mapa, em C)."""
+        i = self._indice(o)
+        while True:
+            achados = list(islice(compress(range(self.base + i, self.base + len(self.mapa)), self.mapa[i:]), n))
+            if len(achados) == n:
+                return achados
+            self._estender()
+
+    def proximo(self, d: date) -> date:
+        """Primeiro dia útil >= d."""
+        return date.fromordinal(self.proximo_ord(d.toordinal()))
 # ------------------------------------------------------------
 
 # ----------------- IO de YAML -------------------------------
+@lru_cache(maxsize=1)
+def _yaml_io() -> Tuple[Any, Any, Any]:
+    """
+    Importa o PyYAML só na primeira leitura/escrita: as saídas antecipadas
+    (arquivo faltando, tudo vindo do cache) não pagam o import.
+    Retorna (módulo yaml, Loader, Dumper do schedule).
+    """
+    import yaml
+
+    # Usa o parser/emitter em C (LibYAML) quando disponível
+    try:
+        from yaml import CSafeLoader as Loader, CSafeDumper as Dumper
+    except ImportError:
+        from yaml import SafeLoader as Loader, SafeDumper as Dumper
+
+    class ScheduleDumper(Dumper):
+        """Datas (date) saem como string ISO entre aspas: o Apps Script lê 'date' como texto."""
+
+        def ignore_aliases(self, data: Any) -> bool:
+            # objetos repetidos (ex.: 'meta' reaproveitado entre PIs) são escritos por extenso
+            return True
+
+    ScheduleDumper.add_representer(date, lambda dumper, d: dumper.represent_str(d.isoformat()))
+    return yaml, Loader, ScheduleDumper
+
 def ler_yaml(caminho: Path) -> Any:
-    with caminho.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+    yaml, loader, _ = _yaml_io()
+    # lê o arquivo inteiro de uma vez; o YAML detecta a codificação (UTF-8)
+    return yaml.load(caminho.read_bytes(), Loader=loader)
+
+def _dump_yaml(conteudo: Any) -> str:
+    yaml, _, dumper = _yaml_io()
+    # width alto: o emitter não precisa decidir quebras de linha nas descrições longas
+    return yaml.dump(
+        conteudo,
+        Dumper=dumper,
+        allow_unicode=True,
+        sort_keys=False,
+        default_flow_style=False,
+        width=1000,
+    )
 
 def salvar_yaml(caminho: Path, conteudo: Any) -> None:
-    with caminho.open("w", encoding="utf-8") as f:
-        yaml.safe_dump(conteudo, f, allow_unicode=True, sort_keys=False)
+    caminho.write_text(_dump_yaml(conteudo), encoding="utf-8")
+    _gravar_cache(caminho, conteudo)
+
+def _eh_lista_em_bloco(caminho: Path) -> bool:
+    """True se o arquivo é uma lista YAML no topo ('- ...') terminada em quebra de linha."""
+    try:
+        with caminho.open("rb") as f:
+            inicio = f.read(2)
+            f.seek(-1, os.SEEK_END)
+            return inicio == b"- " and f.read(1) == b"\n"
+    except OSError:
+        return False
+
+def anexar_yaml(caminho: Path, conteudo: List[Any], novos: List[Any]) -> None:
+    """
+    Grava só os itens novos no fim da lista já existente em caminho.
+    'conteudo' é a lista completa (itens antigos + novos), usada no cache
+    e na regravação quando o arquivo não está no formato de lista.
+    """
+    if not _eh_lista_em_bloco(caminho):
+        salvar_yaml(caminho, conteudo)
+        return
+    if novos:
+        with caminho.open("a", encoding="utf-8") as f:
+            f.write(_dump_yaml(novos))
+        _gravar_cache(caminho, conteudo)
+
+# Cache (pickle) do YAML já interpretado, ao lado do arquivo. O arquivo começa
+# com um cabeçalho fixo (assinatura + mtime_ns + tamanho do YAML) conferido
+# ANTES do unpickle: cache velho ou de outra origem nunca chega ao pickle.load.
+_CACHE_CABECALHO = struct.Struct("<8sqq")
+_CACHE_ASSINATURA = b"SAFePI1\0"
+
+def _caminho_cache(caminho: Path) -> Path:
+    return caminho.with_name(caminho.name + ".cache.pkl")
+
+def _cabecalho_cache(caminho: Path) -> bytes:
+    st = caminho.stat()
+    return _CACHE_CABECALHO.pack(_CACHE_ASSINATURA, st.st_mtime_ns, st.st_size)
+
+def _ler_cache(caminho: Path) -> Optional[Any]:
+    try:
+        esperado = _cabecalho_cache(caminho)
+        with _caminho_cache(caminho).open("rb") as f:
+            if f.read(_CACHE_CABECALHO.size) != esperado:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+        return None
+
+def _gravar_cache(caminho: Path, dados: Any) -> None:
+    try:
+        with _caminho_cache(caminho).open("wb") as f:
+            f.write(_cabecalho_cache(caminho))
+            pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
 
-def carregar_feriados(caminho: Path) -> Dict[date, str]:
-    dados = ler_yaml(caminho)
-    feriados = {}
+def ler_yaml_cacheado(caminho: Path) -> Any:
+    """ler_yaml passando pelo cache: feriados e tabela do PI quase nunca mudam entre execuções."""
+    dados = _ler_cache(caminho)
+    if dados is None:
+        dados = ler_yaml(caminho)
+        _gravar_cache(caminho, dados)
+    return dados
+
+def carregar_feriados_set(caminho: Path) -> Set[date]:
+    # só as datas interessam ao agendamento; 'nome' não é lido
+    dados = ler_yaml_cacheado(caminho)
     if not dados or "feriados" not in dados:
-        return feriados
-    for item in dados["feriados"]:
-        d = parse_data(item.get("data"))
-        nome = item.get("nome", "")
-        feriados[d] = nome
-    return feriados
+        return set()
+    return {parse_data(item.get("data")) for item in dados["feriados"]}
+
+def _parse_skip_date(s: str) -> date:
+    # checagem barata do formato antes de chamar fromisoformat
+    if len(s) != 10 or s[4] != "-" or s[7] != "-":
+        raise ValueError(s)
+    return date.fromisoformat(s)
 
 def carregar_skip_dates(caminho: Path) -> Set[date]:
-    datas: Set[date] = set()
     if not caminho.exists():
-        return datas
-    with caminho.open("r", encoding="utf-8") as f:
-        for i, linha in enumerate(f, 1):
-            s = linha.strip()
-            if not s or s.startswith("#"):
-                continue
-            try:
-                datas.add(date.fromisoformat(s))
-            except Exception:
-                print(f"⚠️ Linha {i} de {caminho} ignorada (esperado ISO YYYY-MM-DD): {s!r}", file=sys.stderr)
+        return set()
+    linhas = caminho.read_text(encoding="utf-8").splitlines()
+    try:
+        # caminho rápido: todas as linhas válidas
+        return {_parse_skip_date(s) for s in (ln.strip() for ln in linhas) if s and not s.startswith("#")}
+    except ValueError:
+        pass
+    # há linha inválida: refaz linha a linha só para avisar quais foram ignoradas
+    datas: Set[date] = set()
+    for i, linha in enumerate(linhas, 1):
+        s = linha.strip()
+        if not s or s.startswith("#"):
+            continue
+        try:
+            datas.add(_parse_skip_date(s))
+        except ValueError:
+            print(f"⚠️ Linha {i} de {caminho} ignorada (esperado ISO YYYY-MM-DD): {s!r}", file=sys.stderr)
     return datas
 
 def carregar_schedule(caminho: Path) -> List[Dict[str, Any]]:
     if not caminho.exists():
         return []
-    dados = ler_yaml(caminho)
+    dados = ler_yaml_cacheado(caminho)
     if dados is None:
         return []
     if isinstance(dados, dict) and "schedule" in dados:
@@ -111,74 +299,89 @@ def carregar_schedule(caminho: Path) -> List[Dict[str, Any]]:
 def data_do_item(o: Dict[str, Any]) -> Optional[date]:
     try:
         if "date" in o:
-            return parse_data(o["date"])
+            v = o["date"]
+            if type(v) is date:
+                return v
+            if type(v) is str and len(v) == 10:
+                # ISO canônico, como o próprio script grava: pula isinstance/strip
+                try:
+                    return _parse_iso(v)
+                except ValueError:
+                    pass
+            return parse_data(v)
     except Exception:
         pass
     return None
 
-def split_schedule_por_data(schedule: List[Dict[str, Any]], pivot: date):
-    """Retorna (passado, futuro) onde passado = datas < pivot; futuro = datas >= pivot"""
-    passado, futuro = [], []
-    for item in schedule:
-        d = data_do_item(item)
-        if d is None:
-            passado.append(item)  # conserva itens sem data
-            continue
-        (passado if d < pivot else futuro).append(item)
-    return passado, futuro
 # ------------------------------------------------------------
 
 # --------- Detecção robusta da tabela do PI -----------------
-_REQUIRED_FIELDS = {"dia", "sprint", "dia_sprint"}
-
 def _parece_item_pi(o: Any) -> bool:
-    return isinstance(o, dict) and _REQUIRED_FIELDS.issubset(set(map(str, o.keys())))
+    # três buscas diretas no dict são mais baratas que comparar com um set de chaves
+    return isinstance(o, dict) and "dia" in o and "sprint" in o and "dia_sprint" in o
 
 def _extrair_lista_se_for_tabela(obj: Any) -> Optional[List[Dict[str, Any]]]:
-    if isinstance(obj, list) and all(isinstance(x, dict) for x in obj):
-        if not obj:
-            return obj
-        if all(_parece_item_pi(x) for x in obj):
-            return obj
-    return None
+    if not isinstance(obj, list):
+        return None
+    # uma passada só: _parece_item_pi já garante que o item é dict
+    for x in obj:
+        if not _parece_item_pi(x):
+            return None
+    return obj
 
-def _buscar_tabela_recursivo(obj: Any) -> Optional[List[Dict[str, Any]]]:
-    cand = _extrair_lista_se_for_tabela(obj)
-    if cand is not None:
-        return cand
-    if isinstance(obj, dict):
-        for _, v in obj.items():
-            achado = _extrair_lista_se_for_tabela(v)
-            if achado is not None:
-                return achado
-        for _, v in obj.items():
-            achado = _buscar_tabela_recursivo(v)
-            if achado is not None:
-                return achado
-    if isinstance(obj, list):
-        for item in obj:
-            achado = _buscar_tabela_recursivo(item)
-            if achado is not None:
-                return achado
+def _buscar_tabela(obj: Any) -> Optional[List[Dict[str, Any]]]:
+    """
+    Primeira lista que pareça a tabela do PI, na mesma ordem da antiga versão
+    recursiva: em cada dict olha um nível à frente (os valores diretos) e só
+    então desce em profundidade. Pilha explícita, sem limite de recursão.
+    """
+    fim = object()
+    # (iterador de filhos, filhos já testados como tabela pelo olhar à frente)
+    pilha = [(iter((obj,)), False)]
+    while pilha:
+        filhos, testados = pilha[-1]
+        atual = next(filhos, fim)
+        if atual is fim:
+            pilha.pop()
+            continue
+        if not testados:
+            cand = _extrair_lista_se_for_tabela(atual)
+            if cand is not None:
+                return cand
+        if isinstance(atual, dict):
+            for v in atual.values():
+                cand = _extrair_lista_se_for_tabela(v)
+                if cand is not None:
+                    return cand
+            pilha.append((iter(atual.values()), True))
+        elif isinstance(atual, list):
+            pilha.append((iter(atual), False))
     return None
 
+def _ordenar_por_dia(tbl: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    chaves = [int(x.get("dia", 0)) for x in tbl]
+    # a tabela costuma vir em ordem no YAML: nesse caso não há o que ordenar
+    if all(a <= b for a, b in zip(chaves, islice(chaves, 1, None))):
+        return tbl
+    ordem = sorted(range(len(tbl)), key=chaves.__getitem__)
+    return [tbl[i] for i in ordem]
+
 def carregar_pi_tabela(caminho: Path) -> List[Dict[str, Any]]:
-    dados = ler_yaml(caminho)
+    """Retorna a tabela do PI já ordenada por 'dia' (invariante usada por gerar_um_pi)."""
+    dados = ler_yaml_cacheado(caminho)
     if isinstance(dados, dict) and "pi" in dados and isinstance(dados["pi"], dict) and "tabela" in dados["pi"]:
         tbl = _extrair_lista_se_for_tabela(dados["pi"]["tabela"])
         if tbl is not None:
-            return list(tbl)
+            return _ordenar_por_dia(tbl)
+    # 'tabela' no topo tem prioridade: outra lista antes dela (até vazia) venceria na busca
     if isinstance(dados, dict) and "tabela" in dados:
         tbl = _extrair_lista_se_for_tabela(dados["tabela"])
         if tbl is not None:
-            return list(tbl)
-    if isinstance(dados, list):
-        tbl = _extrair_lista_se_for_tabela(dados)
-        if tbl is not None:
-            return list(tbl)
-    tbl = _buscar_tabela_recursivo(dados)
+            return _ordenar_por_dia(tbl)
+    # lista no topo: é a própria raiz, testada no primeiro passo da busca
+    tbl = _buscar_tabela(dados)
     if tbl is not None:
-        return list(tbl)
+        return _ordenar_por_dia(tbl)
     msg = [
         "Estrutura de planing-interval.yaml inesperada.",
         "Procura-se por lista de itens com chaves: 'dia', 'sprint', 'dia_sprint'.",
@@ -188,48 +391,69 @@ def carregar_pi_tabela(caminho: Path) -> List[Dict[str, Any]]:
 # ------------------------------------------------------------
 
 # ----------------- Funções auxiliares novas -----------------
-def escolher_start_para_reflow(hoje: date, feriados_set: Set[date]) -> date:
-    return proximo_dia_util(hoje, feriados_set)
+def escolher_start_para_reflow(hoje: date, calendario: CalendarioDiasUteis) -> date:
+    return calendario.proximo(hoje)
+
+_DESC_FIELDS = ("fase", "atividades", "observacoes", "eventos_pi")
 
 def montar_descricao(item: Dict[str, Any]) -> str:
-    partes = []
-    for chave in ("fase", "atividades", "observacoes", "eventos_pi"):
-        v = item.get(chave)
-        if v:
-            partes.append(str(v))
-    return " | ".join(partes) if partes else ""
+    # campos vazios/ausentes ficam de fora; join de nada já devolve ""
+    return " | ".join([str(v) for v in map(item.get, _DESC_FIELDS) if v])
+
+# Linha da tabela já convertida: (dia, sprint, dia_sprint, descricao, meta, cor)
+_LinhaPI = Tuple[int, int, int, str, Dict[str, Any], Any]
+_PRECOMP: Dict[int, Tuple[List[Dict[str, Any]], List[_LinhaPI]]] = {}
+# chaves que viram colunas próprias no schedule e não se repetem em meta
+_META_EXCLUDE = frozenset({"dia", "sprint", "dia_sprint", "cor"})
+
+def _precompila_pi(pi_tabela: List[Dict[str, Any]]) -> List[_LinhaPI]:
+    """Converte a tabela uma vez por execução; as chamadas seguintes de gerar_um_pi reaproveitam."""
+    cache = _PRECOMP.get(id(pi_tabela))
+    if cache is not None and cache[0] is pi_tabela:
+        return cache[1]
+    linhas = [
+        (
+            int(item.get("dia")),
+            int(item.get("sprint")),
+            int(item.get("dia_sprint")),
+            montar_descricao(item),
+            # meta montado uma vez por item e compartilhado entre os PIs gerados
+            {k: v for k, v in item.items() if k not in _META_EXCLUDE},
+            item.get("cor"),
+        )
+        for item in pi_tabela
+    ]
+    _PRECOMP[id(pi_tabela)] = (pi_tabela, linhas)
+    return linhas
 
 def gerar_um_pi(
-        pi_tabela: List[Dict[str, Any]],
+        pi_tabela_sorted: List[Dict[str, Any]],
         start: date,
-        feriados_set: Set[date],
+        calendario: CalendarioDiasUteis,
         pi_number: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
-    tabela = sorted(pi_tabela, key=lambda x: int(x.get("dia", 0)))
+    """Gera um PI a partir do primeiro dia útil >= start (não é preciso rolar start antes)."""
     saida = []
-    data_corrente = start
-    for item in tabela:
-        if not eh_dia_util(data_corrente, feriados_set):
-            data_corrente = proximo_dia_util(data_corrente, feriados_set)
-
+    linhas = _precompila_pi(pi_tabela_sorted)
+    ordinais = calendario.dias_uteis_ord(start.toordinal(), len(linhas))
+    for (dia, sprint, dia_sprint, descricao, meta, cor), ord_corrente in zip(linhas, ordinais):
+        # 'meta' é compartilhado entre PIs (o dumper não gera aliases)
         registro: Dict[str, Any] = {
-            "date": data_corrente.isoformat(),
-            "pi_day": int(item.get("dia")),
-            "sprint": int(item.get("sprint")),
-            "day_in_sprint": int(item.get("dia_sprint")),
-            "descricao": montar_descricao(item),
-            # mantém os extras em meta, mas sem duplicar 'cor'
-            "meta": {k: v for k, v in item.items() if k not in {"dia", "sprint", "dia_sprint", "cor"}},
+            "date": date.fromordinal(ord_corrente),  # serializado como ISO só no dump do YAML
+            "pi_day": dia,
+            "sprint": sprint,
+            "day_in_sprint": dia_sprint,
+            "descricao": descricao,
+            "meta": meta,
         }
 
-        if "cor" in item and item["cor"] is not None:
-            registro["cor"] = item["cor"]
+        if cor is not None:
+            registro["cor"] = cor
 
         if pi_number is not None:
             registro["pi"] = pi_number
 
         saida.append(registro)
-        data_corrente += timedelta(days=1)
     return saida
 
 
@@ -239,75 +463,83 @@ def calcular_emendas(feriados: Set[date]) -> Set[date]:
       - Se o feriado cai na terça (weekday == 1), pula a segunda (d - 1).
       - Se o feriado cai na quinta (weekday == 3), pula a sexta (d + 1).
     Observações:
-      - Só adiciona se esses dias forem dias de semana.
+      - Terça - 1 é sempre segunda e quinta + 1 é sempre sexta (dias de semana).
       - Não duplica se já for feriado.
     """
-    emendas: Set[date] = set()
-    for d in feriados:
-        if d.weekday() == 1:  # terça
-            segunda = d - timedelta(days=1)
-            if 0 <= segunda.weekday() <= 4 and segunda not in feriados:
-                emendas.add(segunda)
-        elif d.weekday() == 3:  # quinta
-            sexta = d + timedelta(days=1)
-            if 0 <= sexta.weekday() <= 4 and sexta not in feriados:
-                emendas.add(sexta)
-    return emendas
+    um_dia = timedelta(days=1)
+    segundas = {d - um_dia for d in feriados if d.weekday() == 1}
+    sextas = {d + um_dia for d in feriados if d.weekday() == 3}
+    return (segundas | sextas) - feriados
 # ------------------------------------------------------------
 
-def primeira_data_no_schedule(schedule: List[Dict[str, Any]]) -> Optional[date]:
-    if not schedule:
-        return None
-    try:
-        return min(parse_data(item["date"]) for item in schedule if "date" in item)
-    except Exception:
-        return None
-
-def ultima_data_no_schedule(schedule: List[Dict[str, Any]]) -> Optional[date]:
-    if not schedule:
-        return None
-    try:
-        return max(parse_data(item["date"]) for item in schedule if "date" in item)
-    except Exception:
-        return None
-
-def max_pi_number(schedule: List[Dict[str, Any]]) -> int:
+def _schedule_stats(schedule: List[Dict[str, Any]]) -> Tuple[Optional[date], Optional[date], int]:
+    """Retorna (primeira data, última data, maior 'pi') em uma única passada."""
+    primeira = ultima = None
     max_pi = 0
     for item in schedule:
+        d = data_do_item(item)
+        if d is not None:
+            if primeira is None or d < primeira:
+                primeira = d
+            if ultima is None or d > ultima:
+                ultima = d
         pi = item.get("pi")
         if isinstance(pi, int) and pi > max_pi:
             max_pi = pi
-    return max_pi
+    return primeira, ultima, max_pi
+
+def _analisa_schedule(schedule: List[Dict[str, Any]], hoje: date) -> Tuple[int, int, Dict[int, date]]:
+    """
+    Uma passada só pelo schedule. Retorna:
+      (maior 'pi' com data <= hoje, maior 'pi', última data de cada 'pi')
+    """
+    pi_hoje = max_pi = 0
+    fim_por_pi: Dict[int, date] = {}
+    for item in schedule:
+        pi = item.get("pi")
+        if not isinstance(pi, int):
+            continue
+        if pi > max_pi:
+            max_pi = pi
+        d = data_do_item(item)
+        if d is None:
+            continue
+        if d <= hoje and pi >= pi_hoje:
+            pi_hoje = pi
+        if pi not in fim_por_pi or d > fim_por_pi[pi]:
+            fim_por_pi[pi] = d
+    return pi_hoje, max_pi, fim_por_pi
 
 # ----------------- Lógica principal -------------------------
 def main() -> None:
+    cfg = Config.load()
+
     # --- entradas obrigatórias ---
-    if not ARQ_FERIADOS.exists():
-        print(f"ERRO: não encontrei {ARQ_FERIADOS}", file=sys.stderr)
+    if not cfg.feriados.exists():
+        print(f"ERRO: não encontrei {cfg.feriados}", file=sys.stderr)
         sys.exit(1)
-    if not ARQ_PI.exists():
-        print(f"ERRO: não encontrei {ARQ_PI}", file=sys.stderr)
+    if not cfg.pi.exists():
+        print(f"ERRO: não encontrei {cfg.pi}", file=sys.stderr)
         sys.exit(1)
 
     # --- feriados + skips ---
-    mapa_feriados = carregar_feriados(ARQ_FERIADOS)
-    feriados_set = set(mapa_feriados.keys())
-    skip_set = carregar_skip_dates(ARQ_SKIP)
+    feriados_set = carregar_feriados_set(cfg.feriados)
+    skip_set = carregar_skip_dates(cfg.skip)
 
     emendas_set: Set[date] = set()
-    if ENV_SKIP_EMENDAS:
+    if cfg.skip_emendas:
         emendas_set = calcular_emendas(feriados_set)
         if emendas_set:
             print(f"Emendas habilitadas: {len(emendas_set)} dia(s) incluído(s) como skip devido a feriados em 3ª/5ª.")
 
     if skip_set:
-        print(f"Skip dates: {len(skip_set)} data(s) será(ão) pulada(s) ({ARQ_SKIP}).")
+        print(f"Skip dates: {len(skip_set)} data(s) será(ão) pulada(s) ({cfg.skip}).")
 
-    feriados_ou_skips = feriados_set | emendas_set | skip_set
+    feriados_ou_skips = frozenset(feriados_set | emendas_set | skip_set)
 
     # --- tabela do PI ---
     try:
-        pi_tabela = carregar_pi_tabela(ARQ_PI)
+        pi_tabela = carregar_pi_tabela(cfg.pi)
         if not pi_tabela:
             raise ValueError("Lista de dias do PI está vazia.")
         print(f"PI detectado com {len(pi_tabela)} linhas.")
@@ -316,53 +548,53 @@ def main() -> None:
         sys.exit(1)
 
     # --- schedule existente ---
-    schedule = carregar_schedule(ARQ_SCHEDULE)
+    schedule = carregar_schedule(cfg.schedule)
     hoje = hoje_sao_paulo()
-    env_str = os.environ.get(ENV_START)
+    calendario = CalendarioDiasUteis(feriados_ou_skips, base=hoje)
+    env_str = cfg.start_env
 
     # Se não existe schedule ainda, usa ENV_START como bootstrap
     if not schedule:
         if not env_str:
-            print(f"ERRO: {ARQ_SCHEDULE} não existe e {ENV_START} não foi definida.", file=sys.stderr)
+            print(f"ERRO: {cfg.schedule} não existe e {ENV_START} não foi definida.", file=sys.stderr)
             sys.exit(1)
 
-        start_boot = proximo_dia_util(parse_data(env_str), feriados_ou_skips)
+        start_boot = parse_data(env_str)
 
         # Primeiro PI sempre como pi = 1
-        atual = gerar_um_pi(pi_tabela, start_boot, feriados_ou_skips, pi_number=1)
-        salvar_yaml(ARQ_SCHEDULE, atual)
+        atual = gerar_um_pi(pi_tabela, start_boot, calendario, pi_number=1)
+        salvar_yaml(cfg.schedule, atual)
         fim = parse_data(atual[-1]["date"])
         print(f"✅ Schedule criado do zero: {len(atual)} dias úteis ({atual[0]['date']} → {atual[-1]['date']}).")
 
         # Se já estiver a ≤5 dias do fim, já emenda o próximo PI (pi = 2)
         faltam_dias = (fim - hoje).days
         if faltam_dias <= 5:
-            prox_start = proximo_dia_util(fim + timedelta(days=1), feriados_ou_skips)
-            prox = gerar_um_pi(pi_tabela, prox_start, feriados_ou_skips, pi_number=2)
-            salvar_yaml(ARQ_SCHEDULE, atual + prox)
+            prox_start = fim + timedelta(days=1)
+            prox = gerar_um_pi(pi_tabela, prox_start, calendario, pi_number=2)
+            anexar_yaml(cfg.schedule, atual + prox, prox)
             print(f"👉 Janela ≤5 dias: próximo PI também gerado ({prox[0]['date']} → {prox[-1]['date']}).")
         sys.exit(0)
 
     # A partir daqui: já existe schedule
-    primeira = primeira_data_no_schedule(schedule)
-    ultimo = ultima_data_no_schedule(schedule)
+    primeira, ultimo, max_pi = _schedule_stats(schedule)
 
     # Tenta interpretar ENV_START (se existir)
     env_data = None
     if env_str:
         try:
             env_data_bruta = parse_data(env_str)
-            env_data = proximo_dia_util(env_data_bruta, feriados_ou_skips)
+            env_data = calendario.proximo(env_data_bruta)
         except Exception as e:
             print(f"⚠️ {ENV_START} ignorada (valor inválido: {env_str!r}): {e}", file=sys.stderr)
             env_data = None
 
     # Caso especial: PLANNING_INTERVAL_START_DATE depois do último dia → anexar novo PI e sair
     if env_data and ultimo and env_data > ultimo:
-        proximo_pi_number = max_pi_number(schedule) + 1 or 1
-        novo_pi = gerar_um_pi(pi_tabela, env_data, feriados_ou_skips, pi_number=proximo_pi_number)
+        proximo_pi_number = max_pi + 1
+        novo_pi = gerar_um_pi(pi_tabela, env_data, calendario, pi_number=proximo_pi_number)
         schedule_atualizado = schedule + novo_pi
-        salvar_yaml(ARQ_SCHEDULE, schedule_atualizado)
+        anexar_yaml(cfg.schedule, schedule_atualizado, novo_pi)
         print(
             f"✅ Novo PI #{proximo_pi_number} anexado: {len(novo_pi)} dias úteis "
             f"({novo_pi[0]['date']} → {novo_pi[-1]['date']})."
@@ -388,9 +620,9 @@ def main() -> None:
     # 1) Gerar um novo PI se o schedule já acabou
     if ultimo < hoje:
         # Já passamos do último dia planejado -> gerar novo PI a partir do dia seguinte
-        proximo_pi_number = max_pi_number(schedule_atualizado) + 1 or 1
-        start_novo_pi = proximo_dia_util(ultimo + timedelta(days=1), feriados_ou_skips)
-        novo_pi = gerar_um_pi(pi_tabela, start_novo_pi, feriados_ou_skips, pi_number=proximo_pi_number)
+        proximo_pi_number = max_pi + 1
+        start_novo_pi = ultimo + timedelta(days=1)
+        novo_pi = gerar_um_pi(pi_tabela, start_novo_pi, calendario, pi_number=proximo_pi_number)
         schedule_atualizado += novo_pi
         ultimo = parse_data(novo_pi[-1]["date"])
         print(
@@ -404,43 +636,24 @@ def main() -> None:
         )
 
     # 2) Descobrir PI atual e fim do PI atual
-    # PI atual = maior 'pi' com data <= hoje; se não tiver, usa o max_pi_number ou 1
-    pi_atual_number = 0
-    for item in schedule_atualizado:
-        d = data_do_item(item)
-        if d is None or d > hoje:
-            continue
-        pi = item.get("pi")
-        if isinstance(pi, int) and pi >= pi_atual_number:
-            pi_atual_number = pi
-
+    # PI atual = maior 'pi' com data <= hoje; se não tiver, usa o maior 'pi' ou 1
+    pi_atual_number, max_pi, fim_por_pi = _analisa_schedule(schedule_atualizado, hoje)
     if pi_atual_number == 0:
-        pi_atual_number = max_pi_number(schedule_atualizado) or 1
+        pi_atual_number = max_pi or 1
 
     # fim do PI atual = maior data dos itens com esse pi
-    datas_pi_atual = [
-        data_do_item(item)
-        for item in schedule_atualizado
-        if item.get("pi") == pi_atual_number and data_do_item(item) is not None
-    ]
-    if not datas_pi_atual:
-        fim_atual = ultimo
-    else:
-        fim_atual = max(datas_pi_atual)
+    fim_atual = fim_por_pi.get(pi_atual_number, ultimo)
 
     # 3) Janela de 5 dias para pré-gerar próximo PI
     faltam_dias = (fim_atual - hoje).days
 
     # Já existe PI futuro? (qualquer item com pi > pi_atual_number)
-    ja_existe_proximo = any(
-        isinstance(item.get("pi"), int) and item["pi"] > pi_atual_number
-        for item in schedule_atualizado
-    )
+    ja_existe_proximo = max_pi > pi_atual_number
 
     if faltam_dias <= 5 and not ja_existe_proximo:
-        prox_start = proximo_dia_util(fim_atual + timedelta(days=1), feriados_ou_skips)
-        proximo_pi_number = max_pi_number(schedule_atualizado) + 1 or (pi_atual_number + 1)
-        prox_pi = gerar_um_pi(pi_tabela, prox_start, feriados_ou_skips, pi_number=proximo_pi_number)
+        prox_start = fim_atual + timedelta(days=1)
+        proximo_pi_number = max_pi + 1
+        prox_pi = gerar_um_pi(pi_tabela, prox_start, calendario, pi_number=proximo_pi_number)
         schedule_atualizado += prox_pi
         print(
             f"⏩ A {faltam_dias} dia(s) do fim do PI #{pi_atual_number}: "
@@ -458,7 +671,8 @@ def main() -> None:
             f"próximo PI será gerado automaticamente quando atingir ≤ 5."
         )
 
-    salvar_yaml(ARQ_SCHEDULE, schedule_atualizado)
+    # linhas existentes nunca mudam: basta anexar o que foi gerado nesta execução
+    anexar_yaml(cfg.schedule, schedule_atualizado, schedule_atualizado[len(schedule):])
 
 
 if __name__ == "__main__":